@@ -32,6 +32,30 @@ SCRAPER_LOG_FILE = "scraping_log.log"
 # How often to check the sheet for new links (in seconds)
 POLL_INTERVAL = 1800
 
+# File that remembers the last sheet row already scanned, so polls only fetch new rows
+CURSOR_FILE = "last_row.json"
+
+# Re-scan the whole sheet every N polls to catch edits to older rows
+FULL_RESCAN_EVERY = 12
+
+# How many sheet rows to scrape concurrently within one poll
+ROW_CONCURRENCY = 3
+
+# How many times a row is attempted within a poll before its error is written
+MAX_TASK_ATTEMPTS = 2
+
+# A new row is only processed after its link has stayed unchanged this long (in seconds)
+DEBOUNCE_SECONDS = 60
+
+# Between polls, ask Drive for changes to the spreadsheet this often (in seconds)
+# and check the sheet early when it changed. POLL_INTERVAL remains the fallback.
+CHANGE_CHECK_INTERVAL = 60
+
+# Remembers the Drive link produced for each source doc revision, so an unchanged
+# doc submitted again reuses the earlier upload instead of being re-scraped
+DOC_CACHE_FILE = "doc_cache.json"
+DOC_CACHE_SIZE = 200
+
 # 4. OUTPUT SETTINGS
 # Google Drive Folder ID to upload scraped files to
 SCOPED_DATA_FOLDER_ID = "1vGkpGQakXrhNfk_YJn2SZUMdcZQTLQXk"
@@ -45,3 +69,29 @@ PLAYWRIGHT_TIMEOUT = 30000
 
 # Kill switch to disable Playwright without code changes
 PLAYWRIGHT_ENABLED = True
+
+# 6. SCRAPING SETTINGS
+# Maximum links scraped at once (shared by every doc being processed)
+SCRAPE_CONCURRENCY = 10
+
+# Maximum links scraped at once from the same host
+HOST_CONCURRENCY = 2
+
+# Minimum seconds between requests to the same host (jittered +/-50%)
+MIN_HOST_INTERVAL = 1.0
+
+# Seconds to wait on a fingerprint attempt before also trying the next one
+# (a retryable answer such as 403 starts the next one immediately)
+FINGERPRINT_STAGGER = 5.0
+
+# Give up on a single link after this many seconds (covers the whole fallback chain)
+LINK_TIMEOUT = 300
+
+# Skip HTML/text responses bigger than this (PDFs use MAX_PDF_BYTES)
+MAX_RESPONSE_BYTES = 4 * 1024 * 1024
+
+# Skip PDFs bigger than this; the body is held in memory and copied to a PDF worker
+MAX_PDF_BYTES = 25 * 1024 * 1024
+
+# Worker processes used to extract text from PDFs (CPU-bound, kept off the event loop)
+PDF_WORKERS = 2
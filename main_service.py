@@ -1,20 +1,26 @@
 import asyncio
+import functools
+import io
+import json
 import os
 import sys
 import logging
 import time
-import gspread
-import re
+import threading
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseUpload
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
 from datetime import datetime
-import urllib.request
-import threading
+import aiohttp
+from aiohttp import web
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Import existing scraper class
-# Ensure dependencies are installed: gspread
+# Ensure dependencies are installed: pip install -r requirements.txt
 try:
-    from scraper import DocScraper
+    from scraper import DocScraper, DRIVE_METADATA_SCOPE, install_uvloop, _DOC_ID_RE
 except ImportError:
     print("Error: scraper.py not found or dependencies missing.")
     sys.exit(1)
@@ -33,6 +39,89 @@ import config
 # Configuration accessed via config.py
 # SPREADSHEET_ID and POLL_INTERVAL are now in config.py
 
+def _doc_id(link):
+    """Google Doc ID from a /d/<id>/ URL segment, or None if the link has none."""
+    match = _DOC_ID_RE.search(link) if "/d/" in link else None
+    return match.group(1) if match else None
+
+# Retry policy for Google API calls: only transient statuses, with jittered
+# exponential backoff so concurrent workers don't retry in lockstep
+_TRANSIENT_STATUSES = (429, 500, 502, 503, 504)
+
+def _error_status(e):
+    """HTTP status of a googleapiclient error (None for anything else)."""
+    if isinstance(e, HttpError):
+        return e.resp.status
+    return None
+
+def _is_transient_error(e):
+    return _error_status(e) in _TRANSIENT_STATUSES
+
+def _is_auth_error(e):
+    return _error_status(e) in (401, 403)
+
+def _log_retry(retry_state):
+    logging.warning(f"{retry_state.fn.__name__} failed ({retry_state.outcome.exception()}), "
+                    f"retrying (attempt {retry_state.attempt_number})...")
+
+_retry_transient = retry(
+    retry=retry_if_exception(_is_transient_error),
+    wait=wait_random_exponential(multiplier=1, max=30),
+    stop=stop_after_attempt(5),
+    before_sleep=_log_retry,
+    reraise=True,
+)
+
+# A Drive change within this many seconds of one of our own sheet writes is taken
+# to be that write (allows for clock skew between us and Drive)
+_OWN_WRITE_GRACE = 5
+
+def _rfc3339_to_epoch(value):
+    """Convert a Drive timestamp like 2024-01-31T12:00:00.000Z to epoch seconds."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+def _column_letter(col_num):
+    """Convert a 1-based column number to its A1 letters (1 -> A, 27 -> AA)."""
+    letters = ""
+    while col_num:
+        col_num, rem = divmod(col_num - 1, 26)
+        letters = chr(ord('A') + rem) + letters
+    return letters
+
+@_retry_transient
+def _batch_get_values(sheets, ranges, major_dimension='ROWS'):
+    """Read several ranges in one values.batchGet; empty ranges come back as []."""
+    response = sheets.values().batchGet(
+        spreadsheetId=config.SPREADSHEET_ID,
+        ranges=ranges,
+        majorDimension=major_dimension
+    ).execute()
+    return [value_range.get('values', []) for value_range in response.get('valueRanges', [])]
+
+@_retry_transient
+def _batch_update_values(sheets, data, value_input_option='RAW'):
+    """Write several ranges in one values.batchUpdate."""
+    return sheets.values().batchUpdate(
+        spreadsheetId=config.SPREADSHEET_ID,
+        body={'valueInputOption': value_input_option, 'data': data}
+    ).execute()
+
+@_retry_transient
+def _upload_next_chunk(request):
+    # A resumable request picks up from the last chunk the server confirmed
+    return request.next_chunk()
+
+def _reauthorize_before_retry(retry_state):
+    logging.warning("Auth expired or failed. Refreshing internal client...")
+    retry_state.args[0].reauthorize()
+
+def _write_json_atomic(path, data):
+    """Write JSON to a temp file and swap it in, so a crash can't leave a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
 # Dashboard State
 class ServiceState:
     def __init__(self):
@@ -40,19 +129,42 @@ class ServiceState:
         self.processed_count = 0
         self.error_count = 0
         self.last_activity = "Initializing..."
-        self.recent_logs = []
+        self.recent_logs = deque(maxlen=50)
         
         # Advanced Metrics
         self.total_duration_seconds = 0.0
         self.last_success_time = None
         self.next_poll_time = None
 
+        # Logs arrive from the event loop and the Google API worker thread
+        self._lock = threading.Lock()
+
     def log(self, message, level="INFO"):
         timestamp = datetime.now().strftime("%H:%M:%S")
         entry = f"{timestamp} - {message}"
-        self.recent_logs.append(entry)
-        if len(self.recent_logs) > 50:
-            self.recent_logs.pop(0)
+        with self._lock:
+            self.recent_logs.append(entry)
+
+    def record_log(self, entry, is_error):
+        """Store a formatted log line; error_count is only ever incremented here."""
+        with self._lock:
+            self.recent_logs.append(entry)
+            if is_error:
+                self.error_count += 1
+
+    def snapshot(self):
+        """Consistent copy of the metrics for /api/status."""
+        with self._lock:
+            return {
+                'uptime_seconds': time.time() - self.start_time,
+                'processed_count': self.processed_count,
+                'error_count': self.error_count,
+                'last_activity': self.last_activity,
+                'total_duration_seconds': self.total_duration_seconds,
+                'last_success_time': self.last_success_time,
+                'next_poll_time': self.next_poll_time,
+                'recent_logs': list(self.recent_logs) # Copy deque
+            }
 
 dashboard_state = ServiceState()
 
@@ -60,13 +172,8 @@ class InMemoryLogHandler(logging.Handler):
     def emit(self, record):
         try:
             log_entry = self.format(record)
-            dashboard_state.recent_logs.append(log_entry)
-            if len(dashboard_state.recent_logs) > 50:
-                dashboard_state.recent_logs.pop(0)
-            
-            # Sync Error Count with actual Error Logs
-            if record.levelno >= logging.ERROR:
-                dashboard_state.error_count += 1
+            # Error Count is synced with actual Error Logs (the single source of truth)
+            dashboard_state.record_log(log_entry, record.levelno >= logging.ERROR)
         except Exception:
             self.handleError(record)
 
@@ -102,110 +209,408 @@ class ResearchService:
     def __init__(self):
         self.scraper = DocScraper()
         self.creds = self.scraper.creds
-        self.gc = gspread.authorize(self.creds)
-        self.drive_service = build('drive', 'v3', credentials=self.creds)
+        self._build_clients()
+        # Blocking Google API calls run on a single worker thread so they don't
+        # stall the event loop (the httplib2-based clients aren't thread-safe).
+        self._google_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="google-api")
+        # Title of the first worksheet, used to build A1 ranges. Fetched once with
+        # spreadsheets.get instead of re-reading metadata every poll.
+        self.sheet_title = None
+        # Final status writes buffered during a poll and flushed in one batch_update
+        self._pending_updates = []
+        # Row cursor: polls only fetch rows below last_row, with a periodic full rescan
+        self.header = None
+        self.last_row = self._load_cursor()
+        self._poll_count = 0
+        # Drive changes feed: page token, and when to retry after a failed check
+        self._changes_token = None
+        self._changes_retry_at = 0.0
+        # When the service itself last wrote to the sheet, so its own edits don't count as changes
+        self._own_write_times = deque(maxlen=20)
+        # doc_id -> (revisionId, drive_link), least recently used first
+        self._doc_cache = self._load_doc_cache()
+        # row -> (draft_link, first seen timestamp) for rows waiting out DEBOUNCE_SECONDS
+        self._first_seen = {}
         
-    def get_worksheet(self):
-        """Helper to get fresh worksheet object with error handling"""
+    def _build_clients(self):
+        """Create the Sheets/Drive clients once; only rebuilt after an auth failure."""
+        # Each client keeps its own keep-alive connection, reused across polls
+        self.sheets = build('sheets', 'v4', credentials=self.creds, cache_discovery=False).spreadsheets()
+        self.drive_service = build('drive', 'v3', credentials=self.creds, cache_discovery=False)
+
+    def reauthorize(self):
+        """Re-run authentication and rebuild the API clients."""
+        self.scraper = DocScraper() # detailed re-auth inside
+        self.creds = self.scraper.creds
+        self._build_clients()
+
+    # On 401/403, re-authorize and retry once
+    @retry(
+        retry=retry_if_exception(_is_auth_error),
+        stop=stop_after_attempt(2),
+        before_sleep=_reauthorize_before_retry,
+        reraise=True,
+    )
+    def get_sheet_title(self):
+        """Title of the first worksheet (cached after the first call)."""
+        if self.sheet_title is None:
+            metadata = self.sheets.get(
+                spreadsheetId=config.SPREADSHEET_ID,
+                fields='sheets.properties.title'
+            ).execute()
+            self.sheet_title = metadata['sheets'][0]['properties']['title']
+        return self.sheet_title
+
+    def _a1(self, cell_range):
+        """Prefix an A1 range with the (quoted) worksheet title."""
+        title = self.sheet_title.replace("'", "''")
+        return f"'{title}'!{cell_range}"
+
+    def _load_cursor(self):
+        """Read the last scanned row number from disk (1 = header only)."""
+        try:
+            with open(config.CURSOR_FILE, 'r', encoding='utf-8') as f:
+                return int(json.load(f).get('last_row', 1))
+        except (OSError, ValueError, AttributeError):
+            return 1
+
+    def _save_cursor(self, last_row):
+        """Persist the cursor atomically so a crash mid-write can't corrupt it."""
+        self.last_row = last_row
         try:
-            sh = self.gc.open_by_key(config.SPREADSHEET_ID)
-            return sh.get_worksheet(0)
-        except gspread.exceptions.APIError as e:
-            if e.response.status_code in [401, 403]:
-                logging.warning("Auth expired or failed. Refreshing internal client...")
-                # Re-authorize
-                self.scraper = DocScraper() # detailed re-auth inside
-                self.creds = self.scraper.creds
-                self.gc = gspread.authorize(self.creds)
-                self.drive_service = build('drive', 'v3', credentials=self.creds)
-                # Retry once
-                sh = self.gc.open_by_key(config.SPREADSHEET_ID)
-                return sh.get_worksheet(0)
-            raise e
-
-    def check_and_process(self):
+            _write_json_atomic(config.CURSOR_FILE, {'last_row': last_row})
+        except OSError as e:
+            logging.warning(f"Failed to save row cursor: {e}")
+
+    def _load_doc_cache(self):
+        """Read the doc_id -> (revisionId, drive_link) cache from disk."""
+        try:
+            with open(config.DOC_CACHE_FILE, 'r', encoding='utf-8') as f:
+                return OrderedDict((doc_id, tuple(entry)) for doc_id, entry in json.load(f).items())
+        except (OSError, ValueError, AttributeError, TypeError):
+            return OrderedDict()
+
+    def _remember_doc(self, doc_id, revision_id, drive_link):
+        """Record a finished upload, evicting the least recently used entries."""
+        self._doc_cache[doc_id] = (revision_id, drive_link)
+        self._doc_cache.move_to_end(doc_id)
+        while len(self._doc_cache) > config.DOC_CACHE_SIZE:
+            self._doc_cache.popitem(last=False)
+        try:
+            _write_json_atomic(config.DOC_CACHE_FILE, self._doc_cache)
+        except OSError as e:
+            logging.warning(f"Failed to save doc cache: {e}")
+
+    def sheet_has_changed(self):
+        """Ask the Drive changes feed whether the spreadsheet changed since the last call.
+
+        Returns False when change tracking is unavailable, so the caller simply
+        falls back to the regular POLL_INTERVAL schedule. Needs the
+        drive.metadata.readonly scope: with drive.file alone the feed never
+        lists the spreadsheet.
+        """
+        if time.time() < self._changes_retry_at:
+            return False
+        # Check what the token was actually granted (or stores), not what SCOPES requests
+        granted = self.creds.granted_scopes or self.creds.scopes or []
+        if DRIVE_METADATA_SCOPE not in granted:
+            logging.warning("Token lacks the drive.metadata.readonly scope, so sheet changes can't be "
+                            "detected early. Regenerate token.json to enable it; using regular polling.")
+            self._changes_retry_at = float('inf')
+            return False
+        try:
+            if self._changes_token is None:
+                response = self.drive_service.changes().getStartPageToken().execute()
+                self._changes_token = response['startPageToken']
+                return False
+
+            changed = False
+            page_token = self._changes_token
+            while page_token:
+                response = self.drive_service.changes().list(
+                    pageToken=page_token,
+                    fields='nextPageToken, newStartPageToken, changes(fileId, time)'
+                ).execute()
+                if any(c.get('fileId') == config.SPREADSHEET_ID and not self._is_own_write(c.get('time'))
+                       for c in response.get('changes', [])):
+                    changed = True
+                if 'newStartPageToken' in response:
+                    self._changes_token = response['newStartPageToken']
+                page_token = response.get('nextPageToken')
+            return changed
+        except Exception as e:
+            logging.warning(f"Drive change check failed, relying on regular polling: {e}")
+            self._changes_token = None
+            self._changes_retry_at = time.time() + config.POLL_INTERVAL
+            return False
+
+    def _is_own_write(self, change_time):
+        """True if a Drive change timestamp matches one of the service's own sheet writes."""
+        if not change_time:
+            return False
+        changed_at = _rfc3339_to_epoch(change_time)
+        return any(abs(changed_at - written_at) <= _OWN_WRITE_GRACE for written_at in self._own_write_times)
+
+    def debounce_ready(self):
+        """True if a row seen earlier has now been stable for DEBOUNCE_SECONDS."""
+        now = time.time()
+        return any(now - seen >= config.DEBOUNCE_SECONDS for _, seen in self._first_seen.values())
+
+    def queue_status_update(self, row_num, col_num, value):
+        """Buffer a cell write; flushed by flush_status_updates() at the end of the poll."""
+        self._pending_updates.append({
+            'range': self._a1(f"{_column_letter(col_num)}{row_num}"),
+            'values': [[value]],
+        })
+
+    def flush_status_updates(self):
+        """Write all buffered status cells in a single Sheets API call."""
+        if not self._pending_updates:
+            return
+        try:
+            _batch_update_values(self.sheets, self._pending_updates, value_input_option='USER_ENTERED')
+            self._own_write_times.append(time.time())
+            logging.info(f"Flushed {len(self._pending_updates)} status update(s) to the Sheet.")
+            self._pending_updates = []
+        except Exception as e:
+            # Keep the buffer so the next poll retries the write
+            logging.error(f"Failed to flush {len(self._pending_updates)} status update(s): {e}")
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        """Run a blocking Google API call on the dedicated worker thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._google_executor, functools.partial(func, *args, **kwargs))
+
+    def _create_browser_pool(self):
+        """Create a Playwright browser pool shared by every row in this poll.
+
+        The pool is lazy - it won't launch Chromium unless a URL actually needs
+        it after curl_cffi fails.
+        """
+        if not (PLAYWRIGHT_AVAILABLE and config.PLAYWRIGHT_ENABLED):
+            return None
+        try:
+            pool = PlaywrightBrowserPool(max_pages=config.PLAYWRIGHT_MAX_PAGES)
+            logging.info("Playwright browser pool ready (lazy - will launch on first need).")
+            return pool
+        except Exception as e:
+            logging.warning(f"Playwright pool creation failed, continuing without it: {e}")
+            return None
+
+    async def check_and_process(self):
         logging.info("Checking Google Sheet for new tasks...")
         dashboard_state.last_activity = "Checking for new tasks..."
+        sheet_title = None
+        pool = None
         try:
-            worksheet = self.get_worksheet()
-            
-            # Get all values
-            all_values = worksheet.get_all_values()
-            if not all_values:
+            sheet_title = await self._run_blocking(self.get_sheet_title)
+
+            # Fetch the header once, then only rows below the cursor. Every
+            # FULL_RESCAN_EVERY polls, re-read everything to catch edits to old rows.
+            full_rescan = self.header is None or self._poll_count % config.FULL_RESCAN_EVERY == 0
+            self._poll_count += 1
+            if full_rescan:
+                (header_rows,) = await self._run_blocking(_batch_get_values, self.sheets, [self._a1("1:1")])
+                self.header = header_rows[0] if header_rows else []
+                start_row = 2
+            else:
+                start_row = self.last_row + 1
+
+            header = self.header
+            if not header:
                 logging.warning("Sheet appears empty.")
+                self.header = None
                 return
 
-            header = all_values[0]
             try:
                 link_col_idx = header.index(config.INPUT_COLUMN_NAME)
                 result_col_idx = header.index(config.OUTPUT_COLUMN_NAME)
             except ValueError as e:
                 logging.error(f"Missing required columns in Sheet: {e}")
-                dashboard_state.error_count += 1
+                self.header = None
                 return
 
-            # Iterate rows (skip header)
-            for i, row in enumerate(all_values[1:], start=2):
-                # Check bounds
-                if len(row) <= link_col_idx: continue
-                
-                draft_link = row[link_col_idx].strip()
+            # Fetch only the input and status columns, in one request
+            link_col = _column_letter(link_col_idx + 1)
+            result_col = _column_letter(result_col_idx + 1)
+            link_range, status_range = await self._run_blocking(
+                _batch_get_values,
+                self.sheets,
+                [self._a1(f"{link_col}{start_row}:{link_col}"), self._a1(f"{result_col}{start_row}:{result_col}")],
+                'COLUMNS'
+            )
+            link_values = link_range[0] if link_range else []
+            status_values = status_range[0] if status_range else []
+            num_rows = max(len(link_values), len(status_values))
+
+            # Collect new tasks (header excluded by the range)
+            tasks = []
+            now = time.time()
+            waiting_rows = set()
+            for offset in range(num_rows):
+                i = start_row + offset
+                draft_link = link_values[offset].strip() if offset < len(link_values) else ""
                 # Check status (Scraped Data column)
-                current_status = row[result_col_idx].strip() if len(row) > result_col_idx else ""
+                current_status = status_values[offset].strip() if offset < len(status_values) else ""
                 
                 if draft_link and not current_status:
-                    logging.info(f"Found new task at Row {i}: {draft_link}")
-                    dashboard_state.last_activity = f"Processing Row {i}..."
-                    # Mark as processing immediately to avoid double-process
-                    try:
-                        worksheet.update_cell(i, result_col_idx + 1, "Processing...")
-                    except Exception as e:
-                        logging.error(f"Failed to mark Row {i} as Processing: {e}")
+                    # Only pick a row up once it has stayed unchanged for DEBOUNCE_SECONDS,
+                    # so we don't grab a link the user is still editing
+                    seen = self._first_seen.get(i)
+                    if seen is None or seen[0] != draft_link:
+                        self._first_seen[i] = (draft_link, now)
+                        waiting_rows.add(i)
+                        continue
+                    if now - seen[1] < config.DEBOUNCE_SECONDS:
+                        waiting_rows.add(i)
                         continue
-                        
-                    self.process_task(worksheet, i, draft_link, result_col_idx + 1) # +1 for 1-based index
-                    
+                    del self._first_seen[i]
+                    logging.info(f"Found new task at Row {i}: {draft_link}")
+                    tasks.append((i, draft_link))
+
+            # Forget rows in the scanned range that were cleared or filled in meanwhile
+            for i in list(self._first_seen):
+                if i >= start_row and i not in waiting_rows:
+                    del self._first_seen[i]
+            if waiting_rows:
+                logging.info(f"{len(waiting_rows)} new row(s) waiting {config.DEBOUNCE_SECONDS}s for edits to settle.")
+
+            if tasks:
+                # Mark every new row as processing up front to avoid double-processing
+                markers = [
+                    {'range': self._a1(f"{result_col}{i}"), 'values': [["Processing..."]]}
+                    for i, _ in tasks
+                ]
+                try:
+                    await self._run_blocking(_batch_update_values, self.sheets, markers)
+                    self._own_write_times.append(time.time())
+                except Exception as e:
+                    logging.error(f"Failed to mark {len(tasks)} row(s) as Processing: {e}")
+                    return
+
+                # One job per source doc, so two rows pointing at the same doc are
+                # never scraped by two workers at once. Jobs are (rows, attempt).
+                jobs = {}
+                for i, draft_link in tasks:
+                    jobs.setdefault(_doc_id(draft_link) or draft_link, []).append((i, draft_link))
+
+                # Work through the jobs with a small pool of concurrent workers
+                queue = asyncio.Queue()
+                for rows_for_doc in jobs.values():
+                    queue.put_nowait((rows_for_doc, 1))
+
+                pool = self._create_browser_pool()
+                self.scraper.browser_pool = pool
+                workers = [
+                    self._worker(queue, result_col_idx + 1) # +1 for 1-based index
+                    for _ in range(min(config.ROW_CONCURRENCY, len(jobs)))
+                ]
+                await asyncio.gather(*workers)
+
+            # Advance the cursor only past rows that have been handled, stopping
+            # before any row still waiting out its debounce period
+            if num_rows:
+                last_handled = start_row + num_rows - 1
+                if waiting_rows:
+                    last_handled = min(waiting_rows) - 1
+                if last_handled >= start_row:
+                    self._save_cursor(last_handled)
+
         except Exception as e:
             logging.error(f"Error checking sheet: {e}")
-            dashboard_state.error_count += 1
+            # Drop the cached metadata so the next poll re-reads it
+            self.sheet_title = None
+        finally:
+            # Always shut down the browser after the poll to free memory
+            if pool:
+                try:
+                    await pool.shutdown()
+                except Exception as e:
+                    logging.warning(f"Error shutting down Playwright pool: {e}")
+            self.scraper.browser_pool = None
+            # Release pooled connections; sessions are recreated on the next poll
+            await self.scraper.aclose()
+            if sheet_title is not None:
+                await self._run_blocking(self.flush_status_updates)
+
+    async def _worker(self, queue, result_col_index):
+        """Pull jobs off the queue until it is empty, re-queueing transient failures."""
+        while True:
+            try:
+                rows, attempt = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            final_attempt = attempt >= config.MAX_TASK_ATTEMPTS
+            retry_rows = []
+            for row_num, draft_link in rows:
+                dashboard_state.last_activity = f"Processing Row {row_num}..."
+                try:
+                    if await self.process_task(row_num, draft_link, result_col_index, final_attempt):
+                        retry_rows.append((row_num, draft_link))
+                except Exception as e:
+                    logging.error(f"Unexpected error processing Row {row_num}: {e}")
+                    self.queue_status_update(row_num, result_col_index, f"Error: {str(e)[:50]}")
 
-    def process_task(self, worksheet, row_num, draft_link, result_col_index):
+            if retry_rows:
+                logging.warning(f"Re-queueing {len(retry_rows)} row(s) for retry "
+                                f"(attempt {attempt + 1}/{config.MAX_TASK_ATTEMPTS}).")
+                queue.put_nowait((retry_rows, attempt + 1))
+
+    async def process_task(self, row_num, draft_link, result_col_index, final_attempt=True):
+        """Scrape one row's doc and queue its status.
+
+        Returns True when the row hit a transient failure and should be retried
+        (only possible when final_attempt is False).
+        """
         # 0. Check if it's a Spreadsheet (common mistake)
         if "/spreadsheets/" in draft_link:
              msg = "Error: Input is a Google Sheet, but this tool scrapes Google Docs."
              logging.error(f"Row {row_num}: {msg}")
-             try:
-                 worksheet.update_cell(row_num, result_col_index, msg)
-             except Exception as e:
-                 logging.error(f"Failed to update sheet: {e}")
+             self.queue_status_update(row_num, result_col_index, msg)
              return
 
         # 1. Extract Doc ID
-        match = re.search(r'/d/([a-zA-Z0-9-_]+)', draft_link)
-        if not match:
+        doc_id = _doc_id(draft_link)
+        if not doc_id:
             # Report invalid URL instead of silent skip
             msg = "Error: Invalid Doc URL format"
             logging.error(f"Row {row_num}: {msg} - Link: {draft_link}")
-            try:
-                worksheet.update_cell(row_num, result_col_index, msg)
-            except Exception as e:
-                logging.error(f"Failed to update sheet for invalid URL at Row {row_num}: {e}")
+            self.queue_status_update(row_num, result_col_index, msg)
             return
 
-        doc_id = match.group(1)
-        
-        # 2. Scrape Items
+        # 2. Reuse the previous upload if the doc hasn't changed since
+        try:
+            revision_id = await self._run_blocking(self.scraper.get_doc_revision, doc_id)
+        except Exception as e:
+            logging.warning(f"Could not read revision for {doc_id}, scraping without cache: {e}")
+            revision_id = None
+
+        cached = self._doc_cache.get(doc_id)
+        if revision_id and cached and cached[0] == revision_id:
+            logging.info(f"Doc {doc_id} unchanged since last scrape. Reusing {cached[1]}")
+            self._doc_cache.move_to_end(doc_id)
+            self.queue_status_update(row_num, result_col_index, cached[1])
+            dashboard_state.processed_count += 1
+            dashboard_state.last_activity = "Task Complete (cached)"
+            dashboard_state.last_success_time = time.time()
+            return
+
+        # 3. Scrape Items
         logging.info(f"Scraping Doc ID: {doc_id} for ALL links...")
         try:
-            links = self.scraper.get_all_links_from_doc(doc_id)
+            links = await self._run_blocking(self.scraper.get_all_links_from_doc, doc_id)
         except Exception as e:
             logging.error(f"Scraper Error for {doc_id}: {e}")
-            worksheet.update_cell(row_num, result_col_index, f"Error: Scraper Failed - {str(e)[:50]}")
+            # Retry rate limits, server errors and network failures; a 403/404 won't fix itself
+            if not final_attempt and (_is_transient_error(e) or not isinstance(e, HttpError)):
+                return True
+            self.queue_status_update(row_num, result_col_index, f"Error: Scraper Failed - {str(e)[:50]}")
             return
         
         if not links:
             logging.warning(f"No links found in doc {doc_id}")
-            worksheet.update_cell(row_num, result_col_index, "No links found or empty")
+            self.queue_status_update(row_num, result_col_index, "No links found or empty")
             return
 
         logging.info(f"Found {len(links)} links. Scraping content...")
@@ -213,203 +618,145 @@ class ResearchService:
         # Prepare output file
         timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
         filename = f"scraped_data_{doc_id}_{timestamp}.md"
-        filepath = os.path.abspath(filename)
+        filepath = filename  # relative to the working directory, which never changes
         
-        # Redirect scraper output to this file
-        self.scraper.output_file = filepath
         # Clear/Create file
         with open(filepath, 'w', encoding='utf-8') as f:
             f.write(f"# Source Doc: {draft_link}\n")
             f.write(f"**Scraped Date:** {datetime.now()}\n\n")
 
-        # Run async scraping
-        async def run_scrape():
-            # Create a Playwright browser pool for this batch (lazy - won't launch
-            # Chromium unless a URL actually needs it after curl_cffi fails)
-            pool = None
-            if PLAYWRIGHT_AVAILABLE and config.PLAYWRIGHT_ENABLED:
-                try:
-                    pool = PlaywrightBrowserPool(max_pages=config.PLAYWRIGHT_MAX_PAGES)
-                    self.scraper.browser_pool = pool
-                    logging.info("Playwright browser pool ready (lazy - will launch on first need).")
-                except Exception as e:
-                    logging.warning(f"Playwright pool creation failed, continuing without it: {e}")
-                    pool = None
-                    self.scraper.browser_pool = None
-            else:
-                self.scraper.browser_pool = None
-
-            try:
-                # Limit concurrency to avoid overwhelming the browser pool
-                # and reduce rate-detection from target sites
-                sem = asyncio.Semaphore(10)
-
-                async def rate_limited_process(link):
-                    async with sem:
-                        return await self.scraper.process_link(link)
-
-                tasks = [rate_limited_process(link) for link in links]
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-
-                # Log any unhandled exceptions from individual tasks
-                for i, result in enumerate(results):
-                    if isinstance(result, Exception):
-                        logging.error(f"Task error for {links[i]}: {result}")
-            finally:
-                # Always shut down the browser after the batch to free memory
-                if pool:
-                    try:
-                        await pool.shutdown()
-                    except Exception as e:
-                        logging.warning(f"Error shutting down Playwright pool: {e}")
-                self.scraper.browser_pool = None
-
         # Track duration
         start_time = time.time()
 
-        try:
-            asyncio.run(run_scrape())
-        except Exception as e:
-             logging.error(f"Scraping execution error: {e}")
-             worksheet.update_cell(row_num, result_col_index, "Error: Scraping execution failed")
-             dashboard_state.error_count += 1
-             return
+        # The scraper bounds concurrency (overall and per host) and times out
+        # stuck links itself, so every link can be handed over at once
+        async def process(url, context):
+            try:
+                await self.scraper.process_link(url, context, output_file=filepath)
+            except Exception as e:
+                # Log unhandled exceptions from individual tasks
+                logging.error(f"Task error for {url}: {e}")
+
+        # Each link appends its own result, so just drain them as they finish
+        for finished in asyncio.as_completed([process(url, context) for url, context in links]):
+            await finished
         
-        # 3. Upload to Drive
-        if os.path.exists(filepath) and os.path.getsize(filepath) > 0:
+        # 4. Upload to Drive (once every queued append has landed)
+        await self.scraper.flush_writes()
+        try:
+            file_size = os.stat(filepath).st_size
+        except FileNotFoundError:
+            file_size = 0
+
+        if file_size > 0:
             logging.info(f"Uploading {filename} to Drive...")
-            drive_link = self.upload_to_drive(filepath, filename)
+            drive_link = await self._run_blocking(self.upload_to_drive, filepath, filename)
             
             if drive_link:
-                # 4. Update Sheet
-                try:
-                    worksheet.update_cell(row_num, result_col_index, drive_link)
-                    logging.info(f"Task Complete. Updated Sheet Row {row_num}.")
-                    
-                    # Update Metrics
-                    dashboard_state.processed_count += 1
-                    dashboard_state.last_activity = "Task Complete"
-                    dashboard_state.last_success_time = time.time()
-                    duration = time.time() - start_time
-                    dashboard_state.total_duration_seconds += duration
-                    
-                except Exception as e:
-                    logging.error(f"Failed to update sheet for Row {row_num}: {e}")
-                    dashboard_state.error_count += 1
-
-                # 5. Cleanup Local File
+                # 5. Update Sheet (flushed with the rest of the poll's writes)
+                self.queue_status_update(row_num, result_col_index, drive_link)
+                if revision_id:
+                    self._remember_doc(doc_id, revision_id, drive_link)
+                logging.info(f"Task Complete. Queued Sheet update for Row {row_num}.")
+
+                # Update Metrics
+                dashboard_state.processed_count += 1
+                dashboard_state.last_activity = "Task Complete"
+                dashboard_state.last_success_time = time.time()
+                duration = time.time() - start_time
+                dashboard_state.total_duration_seconds += duration
+
+                # 6. Cleanup Local File
                 try:
                     os.remove(filepath)
                     logging.info(f"Deleted local file: {filename}")
                 except Exception as e:
                     logging.warning(f"Failed to delete local file: {e}")
             else:
-                 worksheet.update_cell(row_num, result_col_index, "Error: Drive Upload Failed")
-                 dashboard_state.error_count += 1
+                 self.queue_status_update(row_num, result_col_index, "Error: Drive Upload Failed")
         else:
-             worksheet.update_cell(row_num, result_col_index, "Error: No content scraped")
-             dashboard_state.error_count += 1
+             logging.error(f"No content scraped for Row {row_num} (doc {doc_id})")
+             self.queue_status_update(row_num, result_col_index, "Error: No content scraped")
              
     def upload_to_drive(self, filepath, filename):
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                file_metadata = {
-                    'name': filename,
-                    'parents': [config.SCOPED_DATA_FOLDER_ID]
-                }
-                media = MediaFileUpload(filepath, mimetype='text/markdown')
-                
-                file = self.drive_service.files().create(
-                    body=file_metadata,
-                    media_body=media,
-                    fields='id, webViewLink, webContentLink'
-                ).execute()
-                
-                # Make it shareable (anyone with link) - Optional but usually needed for easy access
-                # or just rely on the user owning the file. 
-                # Let's add permission to be safe if the user wants to share it.
-                # self.drive_service.permissions().create(
-                #     fileId=file.get('id'),
-                #     body={'type': 'anyone', 'role': 'reader'}
-                # ).execute()
-
-                return file.get('webViewLink')
-            except Exception as e:
-                logging.warning(f"Drive Upload Error (Attempt {attempt+1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2 * (attempt + 1)) # Backoff: 2s, 4s
-                else:
-                    logging.error(f"Drive Upload Failed after {max_retries} attempts.")
-                    return None
-
-
-def start_keep_alive_server():
-    """Starts a web server to serve the Dashboard and satisfy Render's port binding."""
-    from http.server import HTTPServer, BaseHTTPRequestHandler
-    import threading
-    import json
-
-    class DashboardHandler(BaseHTTPRequestHandler):
-        def do_GET(self):
-            if self.path == '/':
-                self.send_response(200)
-                self.send_header('Content-type', 'text/html')
-                self.end_headers()
-                # Serve the embedded dashboard or read from file
-                try:
-                    with open('dashboard_template.html', 'r', encoding='utf-8') as f:
-                        self.wfile.write(f.read().encode('utf-8'))
-                except FileNotFoundError:
-                    self.wfile.write(b"<h1>Dashboard Error</h1><p>Template not found.</p>")
-            
-            elif self.path == '/api/status':
-                self.send_response(200)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                
-                uptime = time.time() - dashboard_state.start_time
-                stats = {
-                    'uptime_seconds': uptime,
-                    'processed_count': dashboard_state.processed_count,
-                    'error_count': dashboard_state.error_count,
-                    'last_activity': dashboard_state.last_activity,
-                    'total_duration_seconds': dashboard_state.total_duration_seconds,
-                    'last_success_time': dashboard_state.last_success_time,
-                    'next_poll_time': dashboard_state.next_poll_time,
-                    'recent_logs': list(dashboard_state.recent_logs) # Copy list
-                }
-                self.wfile.write(json.dumps(stats).encode('utf-8'))
+        """Upload the markdown file and return its webViewLink (None on failure).
+
+        Uses a resumable upload from memory; each chunk is retried on transient
+        errors, resuming from the last chunk the server confirmed.
+        """
+        try:
+            file_metadata = {
+                'name': filename,
+                'parents': [config.SCOPED_DATA_FOLDER_ID]
+            }
+            with open(filepath, 'rb') as f:
+                buffer = io.BytesIO(f.read())
+            media = MediaIoBaseUpload(buffer, mimetype='text/markdown', resumable=True, chunksize=1024 * 1024)
+
+            request = self.drive_service.files().create(
+                body=file_metadata,
+                media_body=media,
+                fields='id, webViewLink'
+            )
+            file = None
+            while file is None:
+                _, file = _upload_next_chunk(request)
             
-            else:
-                self.send_response(404)
-                self.end_headers()
-                self.wfile.write(b"Not Found")
-        
-        # Suppress log messages to keep console clean
-        def log_message(self, format, *args):
-            pass
+            # Make it shareable (anyone with link) - Optional but usually needed for easy access
+            # or just rely on the user owning the file. 
+            # Let's add permission to be safe if the user wants to share it.
+            # self.drive_service.permissions().create(
+            #     fileId=file.get('id'),
+            #     body={'type': 'anyone', 'role': 'reader'}
+            # ).execute()
+
+            return file.get('webViewLink')
+        except Exception as e:
+            logging.error(f"Drive Upload Failed: {e}")
+            return None
+
+
+async def start_keep_alive_server():
+    """Starts the dashboard web app on the event loop (also satisfies Render's port binding)."""
+
+    async def dashboard(request):
+        # Serve the embedded dashboard or read from file
+        try:
+            with open('dashboard_template.html', 'r', encoding='utf-8') as f:
+                return web.Response(text=f.read(), content_type='text/html')
+        except FileNotFoundError:
+            return web.Response(text="<h1>Dashboard Error</h1><p>Template not found.</p>", content_type='text/html')
+
+    async def status(request):
+        return web.json_response(dashboard_state.snapshot())
+
+    app = web.Application()
+    app.router.add_get('/', dashboard)
+    app.router.add_get('/api/status', status)
 
     port = int(os.environ.get("PORT", 10000))
     try:
-        server = HTTPServer(("0.0.0.0", port), DashboardHandler)
-        server_thread = threading.Thread(target=server.serve_forever)
-        server_thread.daemon = True
-        server_thread.start()
+        # access_log=None keeps request logs out of the console
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "0.0.0.0", port)
+        await site.start()
         print(f"--- Dashboard & Keep-alive server started on port {port} ---")
+        return runner
     except Exception as e:
         print(f"Warning: Failed to start web server: {e}")
+        return None
 
-def start_self_ping():
+def start_self_ping(http_session):
     """
-    Background thread to ping the application's own external URL to prevent Render spin-down.
+    Background task to ping the application's own external URL to prevent Render spin-down.
     Render free instances spin down after 15 minutes of inactivity.
     Pinging every 14 minutes (840 seconds) keeps it active.
     """
     url = os.environ.get("RENDER_EXTERNAL_URL")
     if not url:
         print("Self-ping: RENDER_EXTERNAL_URL not set. Skipping keep-alive ping (Local Mode).")
-        return
+        return None
 
     # Ensure URL starts with http
     if not url.startswith("http"):
@@ -417,58 +764,76 @@ def start_self_ping():
 
     print(f"Self-ping: Active for {url} every 14 minutes.")
 
-    def pinger():
+    async def pinger():
         while True:
             # Wait 14 minutes (840 seconds)
-            time.sleep(840)
+            await asyncio.sleep(840)
             try:
                 # Add a timestamp to avoid caching (optional but good practice)
                 ping_url = f"{url}/api/status?ping={int(time.time())}"
-                with urllib.request.urlopen(ping_url, timeout=10) as response:
-                     status = response.getcode()
-                     print(f"[{datetime.now().strftime('%H:%M:%S')}] Keep-alive ping sent to {url}. Status: {status}")
+                async with http_session.get(ping_url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                    print(f"[{datetime.now().strftime('%H:%M:%S')}] Keep-alive ping sent to {url}. Status: {response.status}")
             except Exception as e:
                 print(f"[{datetime.now().strftime('%H:%M:%S')}] Keep-alive ping failed: {e}")
 
-    thread = threading.Thread(target=pinger, daemon=True)
-    thread.start()
+    return asyncio.create_task(pinger())
 
-def main():
+async def run_service():
     print("--- Starting Research Link Scraper Service (Production) ---")
     print(f"Monitoring Sheet ID: {config.SPREADSHEET_ID}")
     print("Press Ctrl+C to stop.")
     
     # Start the keep-alive server
-    start_keep_alive_server()
+    runner = await start_keep_alive_server()
+
+    async with aiohttp.ClientSession() as http_session:
+        # Start the self-ping mechanism
+        pinger = start_self_ping(http_session)
+
+        # Authenticate off the loop so the dashboard stays responsive meanwhile
+        service = await asyncio.to_thread(ResearchService)
+
+        # Simple exponential backoff for main loop
+        error_count = 0
 
-    # Start the self-ping mechanism
-    start_self_ping()
-    
-    
-    service = ResearchService()
-    
-    # Simple exponential backoff for main loop
-    error_count = 0
-    
-    while True:
         try:
-            service.check_and_process()
-            error_count = 0 # reset on success
-        except KeyboardInterrupt:
-            print("Stopping...")
-            sys.exit(0)
-        except Exception as e:
-            error_count += 1
-            dashboard_state.error_count += 1
-            dashboard_state.last_activity = "Recovering from error..."
-            wait_time = min(config.POLL_INTERVAL * (2 ** (error_count - 1)), 300) # Max 5 min wait
-            logging.error(f"Critical Service Error: {e}. Retrying in {wait_time}s...")
-            dashboard_state.next_poll_time = time.time() + wait_time
-            time.sleep(wait_time)
-            continue
-            
-        dashboard_state.next_poll_time = time.time() + config.POLL_INTERVAL
-        time.sleep(config.POLL_INTERVAL)
+            while True:
+                try:
+                    await service.check_and_process()
+                    error_count = 0 # reset on success
+                except Exception as e:
+                    error_count += 1
+                    dashboard_state.last_activity = "Recovering from error..."
+                    wait_time = min(config.POLL_INTERVAL * (2 ** (error_count - 1)), 300) # Max 5 min wait
+                    logging.error(f"Critical Service Error: {e}. Retrying in {wait_time}s...")
+                    dashboard_state.next_poll_time = time.time() + wait_time
+                    await asyncio.sleep(wait_time)
+                    continue
+
+                next_poll = time.time() + config.POLL_INTERVAL
+                dashboard_state.next_poll_time = next_poll
+
+                # Wait for the next poll, but check early if Drive reports a sheet change
+                while time.time() < next_poll:
+                    await asyncio.sleep(min(config.CHANGE_CHECK_INTERVAL, max(0, next_poll - time.time())))
+                    if await service._run_blocking(service.sheet_has_changed):
+                        logging.info("Spreadsheet changed. Checking for new tasks early.")
+                        break
+                    if service.debounce_ready():
+                        break
+        finally:
+            if pinger:
+                pinger.cancel()
+            if runner:
+                await runner.cleanup()
+
+def main():
+    install_uvloop()
+    try:
+        asyncio.run(run_service())
+    except KeyboardInterrupt:
+        print("Stopping...")
+        sys.exit(0)
 
 if __name__ == "__main__":
     main()
@@ -3,8 +3,11 @@ import re
 import asyncio
 import aiohttp
 import random
+import sys
+import time
 from datetime import datetime
 from urllib.parse import urlparse, urlunparse, parse_qs, urlencode
+from curl_cffi import CurlHttpVersion
 from curl_cffi.requests import AsyncSession
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
@@ -13,21 +16,90 @@ from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from youtube_transcript_api import YouTubeTranscriptApi
 import trafilatura
-from bs4 import BeautifulSoup
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    SELECTOLAX_AVAILABLE = False
 import logging
 import io
-from pypdf import PdfReader
+import string
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+try:
+    from pypdf import PdfReader
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
 # Import config
 import config
 from playwright_scraper import PlaywrightBrowserPool, scrape_with_playwright, is_block_page
 
-# If modifying these scopes, delete the file token.json.
+# Lets the service see changes to the spreadsheet in the Drive changes feed
+# (drive.file only covers files this app created)
+DRIVE_METADATA_SCOPE = 'https://www.googleapis.com/auth/drive.metadata.readonly'
+
+# Requested when a new token is created. Existing tokens keep the scopes they were
+# granted; if modifying these scopes, delete the file token.json to re-consent.
 SCOPES = [
     'https://www.googleapis.com/auth/documents.readonly',
     'https://www.googleapis.com/auth/spreadsheets',
-    'https://www.googleapis.com/auth/drive.file'
+    'https://www.googleapis.com/auth/drive.file',
+    DRIVE_METADATA_SCOPE
 ]
 
+# How many linked Google Docs to keep the extracted text of
+_DOC_TEXT_CACHE_SIZE = 32
+
+# How many successfully scraped URLs (and Wayback lookups) to remember
+_URL_CACHE_SIZE = 500
+
+# Precompiled patterns (these run once per text run / URL / page)
+_URL_RE = re.compile(r'(https?://[^\s\"\'\>]+)')
+_DOC_ID_RE = re.compile(r'/d/([a-zA-Z0-9-_]+)')
+_DOC_URL_ID_RE = re.compile(r'/d/([^/]+)')
+_TAB_RE = re.compile(r'[#?&]tab=([^&?#]+)')
+_CONTENT_CLASS_RE = re.compile(r'content|main|body', re.I)
+_PII_RE = re.compile(r'/pii/([A-Z0-9]+)', re.IGNORECASE)
+_CHARSET_RE = re.compile(r'charset=["\']?([\w.:-]+)')
+
+# Links that can never be scraped: non-web schemes, in-doc anchors (#heading=...)
+# and local addresses. Checked before any network work.
+_SKIP_PREFIXES = ('mailto:', 'javascript:', 'tel:', 'ftp:', 'data:', '#')
+_SKIP_HOSTS_RE = re.compile(r'^https?://(?:localhost|127(?:\.\d+){3}|0\.0\.0\.0|\[::1\])(?:[:/?#]|$)', re.I)
+
+# Line breaks (as str.splitlines sees them) and runs of 2+ spaces; _normalize_whitespace
+# puts each piece between them on its own line
+_WHITESPACE_SPLIT_RE = re.compile(r'\r\n|[\n\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]| {2,}')
+
+# ASCII control characters and binary junk dropped by _sanitize_text (non-ASCII text is kept)
+_SANITIZE_TABLE = dict.fromkeys(c for c in range(128) if chr(c) not in string.printable)
+
+# YouTube URLs that are not a single video
+_YT_NON_VIDEO_RES = tuple(re.compile(p) for p in (
+    r'youtube\.com/@',           # Channel handles
+    r'youtube\.com/c/',          # Channel old format
+    r'youtube\.com/channel/',    # Channel ID format
+    r'youtube\.com/user/',       # User pages
+    r'youtube\.com/playlist\?',  # Playlists
+))
+
+# YouTube video URL formats, tried in order
+_YT_VIDEO_ID_RES = tuple(re.compile(p) for p in (
+    r'(?:v=)([0-9A-Za-z_-]{11})',                          # ?v=VIDEO_ID
+    r'youtu\.be/([0-9A-Za-z_-]{11})',                      # youtu.be/VIDEO_ID
+    r'youtube\.com/shorts/([0-9A-Za-z_-]{11})',             # /shorts/VIDEO_ID
+    r'youtube\.com/embed/([0-9A-Za-z_-]{11})',              # /embed/VIDEO_ID
+    r'youtube\.com/v/([0-9A-Za-z_-]{11})',                  # /v/VIDEO_ID
+))
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -42,12 +114,228 @@ logging.basicConfig(
 logging.getLogger('trafilatura').setLevel(logging.ERROR)
 logging.getLogger('htmldate').setLevel(logging.ERROR)
 
+# Shared process pool for PDF extraction, created on first use
+_pdf_pool = None
+
+
+def _extract_pdf_sync(content_bytes):
+    """Extract text from PDF bytes (runs in a worker process).
+
+    Uses pdfium (C, much faster) and falls back to pure-Python pypdf if pdfium
+    is missing or can't read the file.
+    """
+    if PDFIUM_AVAILABLE:
+        try:
+            pdf = pdfium.PdfDocument(content_bytes)
+            try:
+                return "\n".join(page.get_textpage().get_text_range() for page in pdf)
+            finally:
+                pdf.close()
+        except Exception:
+            pass
+
+    if PYPDF_AVAILABLE:
+        try:
+            reader = PdfReader(io.BytesIO(content_bytes))
+            return "\n".join(page.extract_text() or "" for page in reader.pages)
+        except Exception:
+            pass
+    return None
+
+
+def _append_to_files(texts_by_path):
+    """Append each path's texts to it, opening every file once (runs in a worker thread)."""
+    for path, texts in texts_by_path.items():
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(''.join(texts))
+
+
+def _write_file(path, text):
+    """Create or truncate path with text (runs in a worker thread)."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _normalize_whitespace(text):
+    """Split text on line breaks and runs of spaces, strip the pieces and join the non-empty ones with newlines."""
+    return '\n'.join(filter(None, map(str.strip, _WHITESPACE_SPLIT_RE.split(text))))
+
+
+def _strip_fragment(url):
+    """Drop the #fragment, which never changes the fetched page, except for #/ and #! app routes."""
+    base, sep, fragment = url.partition('#')
+    if sep and base and not fragment.startswith(('/', '!')):
+        return base
+    return url
+
+
+def _flatten_tabs(tabs):
+    """Return every tab and nested child tab, in document (pre-)order."""
+    flat = []
+    stack = list(reversed(tabs))
+    while stack:
+        tab = stack.pop()
+        flat.append(tab)
+        stack.extend(reversed(tab.get('childTabs', [])))
+    return flat
+
+
+def _lru_put(cache, key, value, max_size):
+    """Store value in an OrderedDict used as an LRU cache, evicting the oldest entry."""
+    cache[key] = value
+    cache.move_to_end(key)
+    if len(cache) > max_size:
+        cache.popitem(last=False)
+
+
+def install_uvloop():
+    """Use uvloop (libuv-based event loop) when available - it doesn't support Windows.
+
+    Call from an entry point before asyncio.run; importing modules never changes the loop policy.
+    """
+    if sys.platform != 'win32':
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
+
+
 class DocScraper:
     def __init__(self):
         self.creds = self._authenticate()
         self.output_file = "raw_scraped_content.md"
         self.failed_log = "failed_links.log"
         self.browser_pool = None  # Set by main_service.py per batch
+        # doc_id -> extracted text for Google Docs linked from the source doc
+        self._doc_text_cache = OrderedDict()
+        # cleaned URL -> scraped content, and in-flight scrapes shared by duplicate links
+        self._url_cache = OrderedDict()
+        self._inflight = {}
+        # cleaned URL -> Wayback snapshot URL (or None if there is none)
+        self._wayback_cache = OrderedDict()
+        # Per-thread Docs API client (httplib2 is not thread-safe)
+        self._local = threading.local()
+        # impersonation target -> shared AsyncSession (created on first use)
+        self._sessions = {}
+        # Bound in-flight scrapes overall and per host. Like the sessions, these are
+        # created inside the running loop (on Python 3.9 they bind to a loop when built).
+        self._scrape_sem = None
+        self._host_sems = {}
+        # host -> monotonic time of the latest request slot handed out (see _throttle_host)
+        self._last_hit = {}
+        # (path, text) appends, drained in batches by a single writer task (created on first use)
+        self._write_queue = None
+        self._writer_task = None
+
+    def _session(self, impersonate=None):
+        """Return the shared AsyncSession for an impersonation target, so connections are pooled.
+
+        Sessions negotiate HTTP/2 over TLS, so links to the same host share one multiplexed connection.
+        """
+        session = self._sessions.get(impersonate)
+        if session is None:
+            kwargs = {'impersonate': impersonate} if impersonate else {}
+            session = AsyncSession(http_version=CurlHttpVersion.V2TLS, **kwargs)
+            self._sessions[impersonate] = session
+        return session
+
+    def _global_sem(self):
+        """Return the semaphore limiting concurrent scrapes overall."""
+        if self._scrape_sem is None:
+            self._scrape_sem = asyncio.Semaphore(config.SCRAPE_CONCURRENCY)
+        return self._scrape_sem
+
+    def _host_sem(self, url):
+        """Return the semaphore limiting concurrent scrapes of url's host."""
+        host = urlparse(url).hostname or ''
+        sem = self._host_sems.get(host)
+        if sem is None:
+            sem = self._host_sems[host] = asyncio.Semaphore(config.HOST_CONCURRENCY)
+        return sem
+
+    async def _throttle_host(self, url):
+        """Space links to the same host at least ~MIN_HOST_INTERVAL apart (jittered).
+
+        The first request to a host goes out immediately; later ones wait for their slot.
+        A caller cancelled while waiting gives its slot back if nobody queued behind it.
+        """
+        host = urlparse(url).hostname or ''
+        now = time.monotonic()
+        last = self._last_hit.get(host)
+        slot = now if last is None else max(now, last + config.MIN_HOST_INTERVAL * random.uniform(0.5, 1.5))
+        # Reserve the slot before sleeping so concurrent callers queue up behind it
+        self._last_hit[host] = slot
+        if slot > now:
+            try:
+                await asyncio.sleep(slot - now)
+            except asyncio.CancelledError:
+                if self._last_hit.get(host) == slot:
+                    if last is None:
+                        del self._last_hit[host]
+                    else:
+                        self._last_hit[host] = last
+                raise
+
+    def _queue_write(self, path, text):
+        """Queue text to be appended to path by the writer task."""
+        if self._write_queue is None:
+            self._write_queue = asyncio.Queue()
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._writer())
+        self._write_queue.put_nowait((path, text))
+
+    async def _writer(self):
+        """Drain the write queue, appending each batch with one open() per file."""
+        while True:
+            batch = [await self._write_queue.get()]
+            while True:
+                try:
+                    batch.append(self._write_queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            by_path = {}
+            for path, text in batch:
+                by_path.setdefault(path, []).append(text)
+            try:
+                await asyncio.to_thread(_append_to_files, by_path)
+            except Exception as e:
+                # Keep the writer alive; flush_writes() would wait forever otherwise
+                logging.error(f"Failed to write scraped output: {e}")
+            finally:
+                for _ in batch:
+                    self._write_queue.task_done()
+
+    async def flush_writes(self):
+        """Wait until every queued append has been written to disk."""
+        if self._write_queue is not None:
+            await self._write_queue.join()
+
+    async def aclose(self):
+        """Flush pending writes, drop per-run doc/URL caches and close all shared sessions.
+
+        Sessions, semaphores and the write queue are recreated on the next request.
+        """
+        await self.flush_writes()
+        self._doc_text_cache.clear()
+        self._url_cache.clear()
+        self._wayback_cache.clear()
+        if self._writer_task:
+            self._writer_task.cancel()
+            self._writer_task = None
+
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        self._scrape_sem = None
+        self._write_queue = None
+        self._host_sems.clear()
+        self._last_hit.clear()
+        for session in sessions:
+            try:
+                await session.close()
+            except Exception as e:
+                logging.debug(f"Error closing session: {e}")
 
     def _authenticate(self):
         creds = None
@@ -64,7 +352,9 @@ class DocScraper:
             try:
                 # Load directly from JSON string in Env Var
                 info = json.loads(env_token)
-                creds = Credentials.from_authorized_user_info(info, SCOPES)
+                # Keep the scopes stored in the token: refreshing with scopes it was never
+                # granted (e.g. ones added to SCOPES later) is rejected with invalid_scope
+                creds = Credentials.from_authorized_user_info(info)
                 logging.info("Authenticated using GOOGLE_TOKEN_JSON environment variable.")
             except Exception as e:
                 print(f"DEBUG: JSON Load Error: {e}")
@@ -72,7 +362,7 @@ class DocScraper:
 
         # 2. Try to load from Local File (if Env Var didn't work or wasn't present)
         if not creds and os.path.exists(config.TOKEN_FILE):
-            creds = Credentials.from_authorized_user_file(config.TOKEN_FILE, SCOPES)
+            creds = Credentials.from_authorized_user_file(config.TOKEN_FILE)
             
         if not creds or not creds.valid:
             if creds and creds.expired and creds.refresh_token:
@@ -91,7 +381,6 @@ class DocScraper:
                      raise FileNotFoundError(f"{config.CREDENTIALS_FILE} not found and no Env Vars provided.")
                 
                 # Check if we are in a headless/automated environment
-                import sys
                 if not sys.stdin.isatty():
                     raise PermissionError("Authentication required, but no valid token found in non-interactive session.")
                 
@@ -104,37 +393,97 @@ class DocScraper:
                     token.write(creds.to_json())
         return creds
 
+    def _docs(self):
+        """Return this thread's Docs API documents() resource, building the client once."""
+        service = getattr(self._local, 'docs', None)
+        if service is None:
+            service = self._local.docs = build('docs', 'v1', credentials=self.creds, cache_discovery=False)
+        return service.documents()
+
+    def _fetch_doc(self, document_id):
+        """Fetch a document with all of its tabs; raises HttpError on failure."""
+        # includeTabsContent is required to retrieve the tabs structure
+        return self._docs().get(documentId=document_id, includeTabsContent=True).execute()
+
     def get_doc_content(self, document_id):
         try:
-            service = build('docs', 'v1', credentials=self.creds)
-            # includeTabsContent is required to retrieve the tabs structure
-            document = service.documents().get(documentId=document_id, includeTabsContent=True).execute()
-            return document
+            return self._fetch_doc(document_id)
         except HttpError as err:
             logging.error(f"An error occurred fetching document: {err}")
             return None
 
+    def get_doc_revision(self, document_id):
+        """Return the document's current revisionId (a cheap fields-only fetch)."""
+        document = self._docs().get(documentId=document_id, fields='revisionId').execute()
+        return document.get('revisionId')
+
+    def _collect_doc_content(self, doc):
+        """Return the structural elements of the main body plus every tab and child tab."""
+        content = []
+
+        # 1. Add Main Body
+        if 'body' in doc and 'content' in doc['body']:
+            content.extend(doc['body']['content'])
+
+        # 2. Add All Tabs (including nested ones)
+        for t in _flatten_tabs(doc.get('tabs', [])):
+            if 'documentTab' in t:
+                content.extend(t['documentTab'].get('body', {}).get('content', []))
+
+        return content
+
+    def _paragraph_text(self, paragraph_elements):
+        """Concatenate the text runs of a paragraph."""
+        return ''.join(e.get('textRun', {}).get('content', '') for e in paragraph_elements)
+
+    def _doc_text(self, content):
+        """Plain text of a list of structural elements (paragraphs and tables)."""
+        parts = []
+        for element in content:
+            if 'paragraph' in element:
+                parts.append(self._paragraph_text(element['paragraph'].get('elements', [])))
+            elif 'table' in element:
+                for row in element['table'].get('tableRows', []):
+                    for cell in row.get('tableCells', []):
+                        parts.append(self._doc_text(cell.get('content', [])))
+        return ''.join(parts)
 
     def _find_links_in_element(self, element):
+        """Return (url, context) pairs, where context is the text of the paragraph holding the link.
+
+        Walks nested tables and tables of contents with an explicit stack, in document order.
+        """
         links = []
-        
-        # Check for paragraph elements
-        if 'paragraph' in element:
-            for inner_element in element.get('paragraph').get('elements'):
-                links.extend(self._extract_from_text_run(inner_element))
-        
-        # Check for table elements
-        elif 'table' in element:
-            for row in element.get('table').get('tableRows'):
-                for cell in row.get('tableCells'):
-                    for cell_element in cell.get('content'):
-                        links.extend(self._find_links_in_element(cell_element))
-        
-        # Check for list elements (handled via paragraph usually, but good to be safe)
-        elif 'tableOfContents' in element:
-            for toc_element in element.get('tableOfContents').get('content'):
-                links.extend(self._find_links_in_element(toc_element))
-        
+        stack = [element]
+
+        while stack:
+            element = stack.pop()
+
+            # Check for paragraph elements
+            paragraph = element.get('paragraph')
+            if paragraph is not None:
+                paragraph_elements = paragraph.get('elements', [])
+                context = self._paragraph_text(paragraph_elements).strip()
+                for inner_element in paragraph_elements:
+                    for url in self._extract_from_text_run(inner_element):
+                        links.append((url, context))
+                continue
+
+            # Check for table elements; push cell content in reverse so it pops in order
+            table = element.get('table')
+            if table is not None:
+                children = [cell_element
+                            for row in table.get('tableRows', [])
+                            for cell in row.get('tableCells', [])
+                            for cell_element in cell.get('content', [])]
+                stack.extend(reversed(children))
+                continue
+
+            # Check for list elements (handled via paragraph usually, but good to be safe)
+            toc = element.get('tableOfContents')
+            if toc is not None:
+                stack.extend(reversed(toc.get('content', [])))
+
         return links
 
     def _extract_from_text_run(self, inner_element):
@@ -149,10 +498,11 @@ class DocScraper:
             if url:
                 links.append(url)
         
-        # 2. Regex search in content (for plain text links)
+        # 2. Regex search in content (for plain text links); most runs have no
+        # "://" at all, and the substring check is far cheaper than the regex scan
         text = text_run.get('content', '')
-        if text:
-            urls = re.findall(r'(https?://[^\s\"\'\>]+)', text)
+        if text and '://' in text:
+            urls = _URL_RE.findall(text)
             links.extend(urls)
             
         return links
@@ -171,27 +521,13 @@ class DocScraper:
         Returns None for non-video URLs (channels, playlists, etc.)
         """
         # Skip non-video URLs early
-        non_video_patterns = [
-            r'youtube\.com/@',           # Channel handles
-            r'youtube\.com/c/',          # Channel old format
-            r'youtube\.com/channel/',    # Channel ID format
-            r'youtube\.com/user/',       # User pages
-            r'youtube\.com/playlist\?',  # Playlists
-        ]
-        for pattern in non_video_patterns:
-            if re.search(pattern, url):
+        for pattern in _YT_NON_VIDEO_RES:
+            if pattern.search(url):
                 return None
 
         # Try each video URL pattern
-        video_patterns = [
-            r'(?:v=)([0-9A-Za-z_-]{11})',                          # ?v=VIDEO_ID
-            r'youtu\.be/([0-9A-Za-z_-]{11})',                      # youtu.be/VIDEO_ID
-            r'youtube\.com/shorts/([0-9A-Za-z_-]{11})',             # /shorts/VIDEO_ID
-            r'youtube\.com/embed/([0-9A-Za-z_-]{11})',              # /embed/VIDEO_ID
-            r'youtube\.com/v/([0-9A-Za-z_-]{11})',                  # /v/VIDEO_ID
-        ]
-        for pattern in video_patterns:
-            match = re.search(pattern, url)
+        for pattern in _YT_VIDEO_ID_RES:
+            match = pattern.search(url)
             if match:
                 return match.group(1)
 
@@ -229,12 +565,12 @@ class DocScraper:
         normalized_url = f"https://www.youtube.com/watch?v={video_id}"
         jina_url = f"https://r.jina.ai/{normalized_url}"
         try:
-            async with AsyncSession(impersonate="chrome110") as s:
-                resp = await s.get(jina_url, timeout=25)
-                if resp.status_code == 200 and len(resp.text) > 200:
-                    sanitized = self._sanitize_text(resp.text)
-                    if not is_block_page(sanitized):
-                        return f"[JINA YOUTUBE VERSION] {sanitized}", None
+            s = self._session("chrome110")
+            resp = await s.get(jina_url, timeout=25)
+            if resp.status_code == 200 and len(resp.text) > 200:
+                sanitized = self._sanitize_text(resp.text)
+                if not is_block_page(sanitized):
+                    return f"[JINA YOUTUBE VERSION] {sanitized}", None
         except Exception as e:
             pass
 
@@ -251,6 +587,31 @@ class DocScraper:
 
         return None, "YouTube transcript unavailable via API, Jina, or Playwright"
 
+    async def scrape_google_doc(self, url):
+        """Read a linked Google Doc through the Docs API instead of scraping its web page.
+
+        The text is cached per doc ID for the current run, so a doc linked several times
+        is fetched once. Failed reads are not cached, so a doc shared later is picked up.
+        Falls back to general scraping if the doc can't be read (e.g. no access).
+        """
+        match = _DOC_ID_RE.search(url)
+        if not match:
+            return await self.scrape_general(url)
+        doc_id = match.group(1)
+
+        text = self._doc_text_cache.get(doc_id)
+        if text is not None:
+            self._doc_text_cache.move_to_end(doc_id)
+        else:
+            doc = await asyncio.to_thread(self.get_doc_content, doc_id)
+            text = self._sanitize_text(self._doc_text(self._collect_doc_content(doc))) if doc else None
+            if text is not None:
+                _lru_put(self._doc_text_cache, doc_id, text, _DOC_TEXT_CACHE_SIZE)
+
+        if text:
+            return f"[GOOGLE DOC] {text}", None
+        return await self.scrape_general(url)
+
     def _clean_url(self, url):
         """Remove UTM and other common tracking parameters that might trigger bot detection."""
         parsed = urlparse(url)
@@ -267,45 +628,59 @@ class DocScraper:
         if not text:
             return ""
         # Keep printable characters, newlines, and tabs
-        # This regex removes most binary/control artifacts
-        import string
-        printable = set(string.printable + " " + "\n" + "\r" + "\t")
-        cleaned = "".join(filter(lambda x: x in printable or ord(x) > 127, text))
-        return cleaned.strip()
+        return text.translate(_SANITIZE_TABLE).strip()
 
     async def _extract_pdf_text(self, content_bytes):
-        """Extract text from PDF bytes using pypdf."""
+        """Extract text from PDF bytes in a worker process."""
+        global _pdf_pool
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=config.PDF_WORKERS)
+        pool = _pdf_pool
         try:
-            reader = PdfReader(io.BytesIO(content_bytes))
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            return text
-        except Exception as e:
+            return await asyncio.get_running_loop().run_in_executor(pool, _extract_pdf_sync, content_bytes)
+        except BrokenProcessPool as e:
+            # A crashed worker breaks the pool; shut it down and start a fresh one next time.
+            # Concurrent failures share the same broken pool, so only replace it once.
+            logging.warning(f"PDF extraction failed: {e}")
+            pool.shutdown(wait=False, cancel_futures=True)
+            if _pdf_pool is pool:
+                _pdf_pool = None
             return None
 
     def _extract_text_from_html(self, html):
-        """Extract readable text from HTML using trafilatura with BS4 fallback."""
+        """Extract readable text from HTML using trafilatura, falling back to a main-content scan."""
         result = trafilatura.extract(html)
         if result:
             return self._sanitize_text(result)
 
+        text = self._selectolax_fallback(html) if SELECTOLAX_AVAILABLE else self._bs4_fallback(html)
+
+        text = _normalize_whitespace(text)
+        return self._sanitize_text(text) if text else None
+
+    def _selectolax_fallback(self, html):
+        """Raw text of the page's main content (or whole body), parsed with lexbor."""
+        tree = LexborHTMLParser(html)
+        tree.strip_tags(['script', 'style'])
+        main_content = (tree.css_first('main') or tree.css_first('article') or
+                        next((div for div in tree.css('div[class]')
+                              if _CONTENT_CLASS_RE.search(div.attributes.get('class') or '')), None))
+        node = main_content or tree.body or tree.root
+        return node.text(separator=' ') if node else ''
+
+    def _bs4_fallback(self, html):
+        """Same as _selectolax_fallback, for installs without selectolax."""
+        from bs4 import BeautifulSoup
+
         soup = BeautifulSoup(html, 'lxml')
         for script in soup(["script", "style"]):
             script.decompose()
 
         main_content = (soup.find('main') or soup.find('article') or
-                       soup.find('div', class_=re.compile(r'content|main|body', re.I)))
+                       soup.find('div', class_=_CONTENT_CLASS_RE))
         if main_content:
-            text = main_content.get_text(separator=' ')
-        else:
-            text = soup.get_text(separator=' ')
-
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = '\n'.join(chunk for chunk in chunks if chunk)
-
-        return self._sanitize_text(text) if text.strip() else None
+            return main_content.get_text(separator=' ')
+        return soup.get_text(separator=' ')
 
     def _should_try_playwright(self, last_status_code=None, last_error=None):
         """Determine if a failed curl_cffi attempt warrants a Playwright retry.
@@ -335,16 +710,24 @@ class DocScraper:
         return False
 
     async def _get_wayback_url(self, url):
-        """Try to find the most recent archived version of a URL on Wayback Machine."""
+        """Try to find the most recent archived version of a URL on Wayback Machine.
+
+        Answers from the API (including "no snapshot") are cached; failed lookups are not.
+        """
+        if url in self._wayback_cache:
+            self._wayback_cache.move_to_end(url)
+            return self._wayback_cache[url]
+
         api_url = f"https://archive.org/wayback/available?url={url}"
         try:
-            async with AsyncSession() as s:
-                resp = await s.get(api_url, timeout=10)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    closest = data.get("archived_snapshots", {}).get("closest", {})
-                    if closest.get("available") and closest.get("url"):
-                        return closest["url"]
+            s = self._session()
+            resp = await s.get(api_url, timeout=10)
+            if resp.status_code == 200:
+                data = resp.json()
+                closest = data.get("archived_snapshots", {}).get("closest", {})
+                snapshot = closest["url"] if closest.get("available") and closest.get("url") else None
+                _lru_put(self._wayback_cache, url, snapshot, _URL_CACHE_SIZE)
+                return snapshot
         except Exception:
             pass
         return None
@@ -353,12 +736,12 @@ class DocScraper:
         """Try to fetch content from Google's web cache."""
         cache_url = f"https://webcache.googleusercontent.com/search?q=cache:{url}"
         try:
-            async with AsyncSession(impersonate="chrome120") as s:
-                resp = await s.get(cache_url, timeout=15, allow_redirects=True)
-                if resp.status_code == 200:
-                    extracted = self._extract_text_from_html(resp.text)
-                    if extracted and not is_block_page(extracted) and len(extracted) > 200:
-                        return extracted
+            s = self._session("chrome120")
+            resp = await s.get(cache_url, timeout=15, allow_redirects=True)
+            if resp.status_code == 200:
+                extracted = self._extract_text_from_html(resp.text)
+                if extracted and not is_block_page(extracted) and len(extracted) > 200:
+                    return extracted
         except Exception as e:
             logging.debug(f"Google Cache failed for {url}: {str(e)}")
         return None
@@ -367,12 +750,12 @@ class DocScraper:
         """Try to fetch content from archive.today (archive.ph)."""
         archive_api = f"https://archive.ph/newest/{url}"
         try:
-            async with AsyncSession(impersonate="chrome120") as s:
-                resp = await s.get(archive_api, timeout=15, allow_redirects=True)
-                if resp.status_code == 200:
-                    extracted = self._extract_text_from_html(resp.text)
-                    if extracted and not is_block_page(extracted) and len(extracted) > 200:
-                        return extracted
+            s = self._session("chrome120")
+            resp = await s.get(archive_api, timeout=15, allow_redirects=True)
+            if resp.status_code == 200:
+                extracted = self._extract_text_from_html(resp.text)
+                if extracted and not is_block_page(extracted) and len(extracted) > 200:
+                    return extracted
         except Exception as e:
             logging.debug(f"archive.today failed for {url}: {str(e)}")
         return None
@@ -380,7 +763,7 @@ class DocScraper:
     async def _try_sciencedirect_abstract(self, url):
         """Try to extract ScienceDirect paper metadata via APIs when Cloudflare blocks direct access."""
         # Extract PII from ScienceDirect URL
-        pii_match = re.search(r'/pii/([A-Z0-9]+)', url, re.IGNORECASE)
+        pii_match = _PII_RE.search(url)
         if not pii_match:
             return None
         pii = pii_match.group(1)
@@ -388,52 +771,142 @@ class DocScraper:
         # Try Semantic Scholar API (free, no auth needed)
         try:
             sem_url = f"https://api.semanticscholar.org/graph/v1/paper/DOI:10.1016/{pii[:4]}.{pii[4:]}?fields=title,abstract,authors,year,citationCount"
-            async with AsyncSession() as s:
-                resp = await s.get(sem_url, timeout=10)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    parts = []
-                    if data.get('title'):
-                        parts.append(f"Title: {data['title']}")
-                    if data.get('authors'):
-                        authors = ', '.join(a.get('name', '') for a in data['authors'][:10])
-                        parts.append(f"Authors: {authors}")
-                    if data.get('year'):
-                        parts.append(f"Year: {data['year']}")
-                    if data.get('abstract'):
-                        parts.append(f"Abstract: {data['abstract']}")
-                    if data.get('citationCount'):
-                        parts.append(f"Citations: {data['citationCount']}")
-                    if parts:
-                        return '\n'.join(parts)
+            s = self._session()
+            resp = await s.get(sem_url, timeout=10)
+            if resp.status_code == 200:
+                data = resp.json()
+                parts = []
+                if data.get('title'):
+                    parts.append(f"Title: {data['title']}")
+                if data.get('authors'):
+                    authors = ', '.join(a.get('name', '') for a in data['authors'][:10])
+                    parts.append(f"Authors: {authors}")
+                if data.get('year'):
+                    parts.append(f"Year: {data['year']}")
+                if data.get('abstract'):
+                    parts.append(f"Abstract: {data['abstract']}")
+                if data.get('citationCount'):
+                    parts.append(f"Citations: {data['citationCount']}")
+                if parts:
+                    return '\n'.join(parts)
         except Exception as e:
             logging.debug(f"Semantic Scholar failed for {pii}: {str(e)}")
 
         # Try CrossRef API as backup
         try:
             cr_url = f"https://api.crossref.org/works?query.bibliographic={pii}&rows=1"
-            async with AsyncSession() as s:
-                resp = await s.get(cr_url, timeout=10)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    items = data.get('message', {}).get('items', [])
-                    if items:
-                        item = items[0]
-                        parts = []
-                        if item.get('title'):
-                            parts.append(f"Title: {item['title'][0]}")
-                        if item.get('author'):
-                            authors = ', '.join(f"{a.get('given', '')} {a.get('family', '')}" for a in item['author'][:10])
-                            parts.append(f"Authors: {authors}")
-                        if item.get('abstract'):
-                            parts.append(f"Abstract: {item['abstract']}")
-                        if parts:
-                            return '\n'.join(parts)
+            s = self._session()
+            resp = await s.get(cr_url, timeout=10)
+            if resp.status_code == 200:
+                data = resp.json()
+                items = data.get('message', {}).get('items', [])
+                if items:
+                    item = items[0]
+                    parts = []
+                    if item.get('title'):
+                        parts.append(f"Title: {item['title'][0]}")
+                    if item.get('author'):
+                        authors = ', '.join(f"{a.get('given', '')} {a.get('family', '')}" for a in item['author'][:10])
+                        parts.append(f"Authors: {authors}")
+                    if item.get('abstract'):
+                        parts.append(f"Abstract: {item['abstract']}")
+                    if parts:
+                        return '\n'.join(parts)
         except Exception as e:
             logging.debug(f"CrossRef failed for {pii}: {str(e)}")
 
         return None
 
+    async def _fetch_with_fingerprint(self, clean_url, fp):
+        """Make one curl_cffi attempt with impersonation target fp.
+
+        Returns (content, error, status_code, done); done means the result is final
+        and the other fingerprints can stop.
+        """
+        headers = {
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
+            "Accept-Language": "en-US,en;q=0.9",
+            "Referer": "https://www.google.com/",
+            "DNT": "1",
+            "Upgrade-Insecure-Requests": "1",
+            # Modern Client Hints to look more "human"
+            "sec-ch-ua": '"Not A;Brand";v="99", "Chromium";v="110", "Google Chrome";v="110"',
+            "sec-ch-ua-mobile": "?0",
+            "sec-ch-ua-platform": '"Windows"',
+            "Sec-Fetch-Dest": "document",
+            "Sec-Fetch-Mode": "navigate",
+            "Sec-Fetch-Site": "cross-site",
+            "Sec-Fetch-User": "?1"
+        }
+
+        s = self._session(fp)
+        # Stream the body so oversized pages can be abandoned without downloading them
+        async with s.stream("GET", clean_url, timeout=25, allow_redirects=True, headers=headers) as response:
+            if response.status_code == 200:
+                content_type = response.headers.get("Content-Type", "").lower()
+                is_pdf = "application/pdf" in content_type or clean_url.endswith(".pdf")
+
+                if not is_pdf and "text/html" not in content_type and "text/plain" not in content_type:
+                    return None, f"Unsupported Content-Type: {content_type}", 200, True
+
+                # PDFs get a larger cap: big documents are usually the point
+                limit = config.MAX_PDF_BYTES if is_pdf else config.MAX_RESPONSE_BYTES
+                body = await self._read_body(response, limit)
+                if body is None:
+                    return None, f"Response larger than {limit} bytes", 200, True
+
+                # Handle PDFs
+                if is_pdf:
+                    logging.info(f"Detected PDF content at {clean_url}")
+                    text = await self._extract_pdf_text(body)
+                    if text:
+                        return self._sanitize_text(text), None, 200, True
+                    return None, "Failed to extract text from PDF", 200, True
+
+                # Handle HTML/Text
+                html = self._decode_body(body, content_type)
+                extracted = self._extract_text_from_html(html)
+                if extracted and not is_block_page(extracted):
+                    return extracted, None, 200, True
+                elif extracted:
+                    logging.warning(f"curl_cffi got block page from {clean_url} with {fp}")
+                    return None, "Extracted text was a block/consent page", None, False
+                else:
+                    return None, "Extracted text was empty", None, False
+
+            elif response.status_code in [401, 403, 405, 429, 202, 500]:
+                # These status codes may be fixable by Playwright or another fingerprint
+                logging.warning(f"Got {response.status_code} for {clean_url} with {fp}")
+                return None, None, response.status_code, False
+            else:
+                # Genuine errors (404, etc.) - no point retrying
+                return None, f"HTTP Error {response.status_code}", response.status_code, True
+
+    async def _read_body(self, response, limit=None):
+        """Read a streamed response body; returns None as soon as it exceeds limit bytes."""
+        try:
+            if limit and int(response.headers.get("Content-Length") or 0) > limit:
+                return None
+        except ValueError:
+            pass
+
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_content():
+            size += len(chunk)
+            if limit and size > limit:
+                return None
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def _decode_body(self, body, content_type):
+        """Decode body with the charset from the Content-Type header (UTF-8 if missing or unknown)."""
+        match = _CHARSET_RE.search(content_type)
+        try:
+            return body.decode(match.group(1) if match else 'utf-8', errors='replace')
+        except LookupError:
+            return body.decode('utf-8', errors='replace')
+
     async def scrape_general(self, url):
         clean_url = self._clean_url(url)
 
@@ -445,77 +918,43 @@ class DocScraper:
         last_status_code = None
         last_error = None
 
-        for fp in fingerprints:
-            try:
-                # Add a small random jitter to avoid rapid-fire detection
-                await asyncio.sleep(random.uniform(0.5, 1.5))
-
-                headers = {
-                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8",
-                    "Accept-Language": "en-US,en;q=0.9",
-                    "Referer": "https://www.google.com/",
-                    "DNT": "1",
-                    "Upgrade-Insecure-Requests": "1",
-                    # Modern Client Hints to look more "human"
-                    "sec-ch-ua": '"Not A;Brand";v="99", "Chromium";v="110", "Google Chrome";v="110"',
-                    "sec-ch-ua-mobile": "?0",
-                    "sec-ch-ua-platform": '"Windows"',
-                    "Sec-Fetch-Dest": "document",
-                    "Sec-Fetch-Mode": "navigate",
-                    "Sec-Fetch-Site": "cross-site",
-                    "Sec-Fetch-User": "?1"
-                }
-
-                async with AsyncSession(impersonate=fp) as s:
-                    response = await s.get(clean_url, timeout=25, allow_redirects=True, headers=headers)
-
-                    if response.status_code == 200:
-                        content_type = response.headers.get("Content-Type", "").lower()
-
-                        # Handle PDFs
-                        if "application/pdf" in content_type or clean_url.endswith(".pdf"):
-                            logging.info(f"Detected PDF content at {clean_url}")
-                            text = await self._extract_pdf_text(response.content)
-                            if text:
-                                return self._sanitize_text(text), None
-                            return None, "Failed to extract text from PDF"
-
-                        # Handle HTML/Text
-                        if "text/html" in content_type or "text/plain" in content_type:
-                            html = response.text
-                            extracted = self._extract_text_from_html(html)
-                            if extracted and not is_block_page(extracted):
-                                return extracted, None
-                            elif extracted:
-                                last_error = "Extracted text was a block/consent page"
-                                logging.warning(f"curl_cffi got block page from {clean_url} with {fp}, trying next...")
-                                continue
-                            else:
-                                last_error = "Extracted text was empty"
-                                continue  # Try next fingerprint before giving up
-
-                        return None, f"Unsupported Content-Type: {content_type}"
-
-                    elif response.status_code == 429:
-                        # Rate limited — wait and retry with next fingerprint
-                        last_status_code = response.status_code
-                        logging.warning(f"Got 429 (rate limited) for {clean_url} with {fp}, waiting 5s before next fingerprint...")
-                        await asyncio.sleep(5)
-                        continue
+        # Avoid rapid-fire detection: repeat links to one host are spaced out. This runs
+        # once per link; the staggering below spaces this link's own attempts.
+        await self._throttle_host(clean_url)
 
-                    elif response.status_code in [401, 403, 405, 202, 500]:
-                        # These status codes may be fixable by Playwright or next fingerprint
-                        last_status_code = response.status_code
-                        logging.warning(f"Got {response.status_code} for {clean_url} with {fp}, trying next fingerprint...")
-                        continue # Try next fingerprint, then Playwright
-                    else:
-                        # Genuine errors (404, etc.) - no point retrying
-                        last_status_code = response.status_code
-                        return None, f"HTTP Error {response.status_code}"
-            except Exception as e:
-                last_error = str(e)
-                logging.error(f"Error scraping {clean_url} with {fp}: {str(e)}")
-                continue
+        # Stagger the fingerprints so attempts against one origin rarely overlap: the next
+        # one starts when the previous gives a retryable answer, or after FINGERPRINT_STAGGER
+        # seconds without one. The first final answer wins and the rest are cancelled.
+        waiting = list(fingerprints)
+        attempts = {}
+        pending = set()
+        try:
+            while waiting or pending:
+                # Each pass follows a timeout or a retryable answer, so start the next fingerprint
+                if waiting:
+                    fp = waiting.pop(0)
+                    attempt = asyncio.create_task(self._fetch_with_fingerprint(clean_url, fp))
+                    attempts[attempt] = fp
+                    pending.add(attempt)
+
+                done, pending = await asyncio.wait(pending, timeout=config.FINGERPRINT_STAGGER,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    try:
+                        content, error, status_code, final = attempt.result()
+                    except Exception as e:
+                        last_error = str(e)
+                        logging.error(f"Error scraping {clean_url} with {attempts[attempt]}: {str(e)}")
+                        continue
+                    if final:
+                        return content, error
+                    if status_code is not None:
+                        last_status_code = status_code
+                    if error:
+                        last_error = error
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
 
         # PLAYWRIGHT FALLBACK: For sites with JS challenges (Cloudflare, etc.)
         if self._should_try_playwright(last_status_code, last_error):
@@ -539,14 +978,14 @@ class DocScraper:
         logging.info(f"Trying Jina Reader fallback for {clean_url}...")
         jina_url = f"https://r.jina.ai/{clean_url}"
         try:
-            async with AsyncSession(impersonate="chrome110") as s:
-                resp = await s.get(jina_url, timeout=25)
-                if resp.status_code == 200 and len(resp.text) > 200:
-                    sanitized = self._sanitize_text(resp.text)
-                    if not is_block_page(sanitized):
-                        return f"[JINA READER VERSION] {sanitized}", None
-                    else:
-                        logging.warning(f"Jina Reader returned a block/error page for {clean_url}, falling through...")
+            s = self._session("chrome110")
+            resp = await s.get(jina_url, timeout=25)
+            if resp.status_code == 200 and len(resp.text) > 200:
+                sanitized = self._sanitize_text(resp.text)
+                if not is_block_page(sanitized):
+                    return f"[JINA READER VERSION] {sanitized}", None
+                else:
+                    logging.warning(f"Jina Reader returned a block/error page for {clean_url}, falling through...")
         except Exception as e:
             logging.error(f"Jina Reader failed for {clean_url}: {str(e)}")
 
@@ -567,12 +1006,12 @@ class DocScraper:
         wayback_url = await self._get_wayback_url(clean_url)
         if wayback_url:
             try:
-                async with AsyncSession(impersonate="chrome110") as s:
-                    resp = await s.get(wayback_url, timeout=20)
-                    if resp.status_code == 200:
-                        result = trafilatura.extract(resp.text)
-                        if result:
-                            return f"[ARCHIVED VERSION] {self._sanitize_text(result)}", None
+                s = self._session("chrome110")
+                resp = await s.get(wayback_url, timeout=20)
+                if resp.status_code == 200:
+                    result = trafilatura.extract(resp.text)
+                    if result:
+                        return f"[ARCHIVED VERSION] {self._sanitize_text(result)}", None
             except Exception as e:
                 logging.error(f"Wayback fallback failed for {clean_url}: {str(e)}")
 
@@ -602,12 +1041,12 @@ class DocScraper:
 
         # Method 1: old.reddit.com HTML
         try:
-            async with AsyncSession(impersonate="chrome110") as s:
-                response = await s.get(old_url, timeout=25, allow_redirects=True, headers=headers)
-                if response.status_code == 200:
-                    extracted = self._extract_text_from_html(response.text)
-                    if extracted and not is_block_page(extracted):
-                        return f"[REDDIT] {extracted}", None
+            s = self._session("chrome110")
+            response = await s.get(old_url, timeout=25, allow_redirects=True, headers=headers)
+            if response.status_code == 200:
+                extracted = self._extract_text_from_html(response.text)
+                if extracted and not is_block_page(extracted):
+                    return f"[REDDIT] {extracted}", None
         except Exception as e:
             logging.warning(f"Reddit old.reddit.com failed: {str(e)}")
 
@@ -619,58 +1058,58 @@ class DocScraper:
                 "User-Agent": "Mozilla/5.0 (research-link-scraper; academic)",
                 "Accept": "application/json",
             }
-            async with AsyncSession() as s:
-                resp = await s.get(json_url, timeout=20, headers=json_headers)
-                if resp.status_code == 200:
-                    import json
-                    data = resp.json()
-                    parts = []
-                    # Extract post title and selftext
-                    if isinstance(data, list) and len(data) > 0:
-                        post_data = data[0].get('data', {}).get('children', [{}])[0].get('data', {})
-                        title = post_data.get('title', '')
-                        selftext = post_data.get('selftext', '')
-                        if title:
-                            parts.append(f"Title: {title}")
-                        if selftext:
-                            parts.append(f"Post: {selftext}")
-                        # Extract top comments
-                        if len(data) > 1:
-                            comments = data[1].get('data', {}).get('children', [])
-                            for c in comments[:10]:  # Top 10 comments
-                                cdata = c.get('data', {})
-                                body = cdata.get('body', '')
-                                if body:
-                                    parts.append(f"Comment: {body}")
-                    if parts:
-                        text = '\n\n'.join(parts)
-                        return f"[REDDIT JSON] {self._sanitize_text(text)}", None
+            s = self._session()
+            resp = await s.get(json_url, timeout=20, headers=json_headers)
+            if resp.status_code == 200:
+                import json
+                data = resp.json()
+                parts = []
+                # Extract post title and selftext
+                if isinstance(data, list) and len(data) > 0:
+                    post_data = data[0].get('data', {}).get('children', [{}])[0].get('data', {})
+                    title = post_data.get('title', '')
+                    selftext = post_data.get('selftext', '')
+                    if title:
+                        parts.append(f"Title: {title}")
+                    if selftext:
+                        parts.append(f"Post: {selftext}")
+                    # Extract top comments
+                    if len(data) > 1:
+                        comments = data[1].get('data', {}).get('children', [])
+                        for c in comments[:10]:  # Top 10 comments
+                            cdata = c.get('data', {})
+                            body = cdata.get('body', '')
+                            if body:
+                                parts.append(f"Comment: {body}")
+                if parts:
+                    text = '\n\n'.join(parts)
+                    return f"[REDDIT JSON] {self._sanitize_text(text)}", None
         except Exception as e:
             logging.warning(f"Reddit JSON API failed: {str(e)}")
 
         # Method 3: Jina Reader
         jina_url = f"https://r.jina.ai/{url}"
         try:
-            async with AsyncSession(impersonate="chrome110") as s:
-                resp = await s.get(jina_url, timeout=25)
-                if resp.status_code == 200 and len(resp.text) > 200:
-                    sanitized = self._sanitize_text(resp.text)
-                    if not is_block_page(sanitized):
-                        return f"[JINA REDDIT VERSION] {sanitized}", None
-                    else:
-                        logging.warning(f"Jina Reddit returned a block/error page, falling through...")
+            s = self._session("chrome110")
+            resp = await s.get(jina_url, timeout=25)
+            if resp.status_code == 200 and len(resp.text) > 200:
+                sanitized = self._sanitize_text(resp.text)
+                if not is_block_page(sanitized):
+                    return f"[JINA REDDIT VERSION] {sanitized}", None
+                else:
+                    logging.warning(f"Jina Reddit returned a block/error page, falling through...")
         except Exception as e:
             logging.warning(f"Jina Reddit fallback failed: {str(e)}")
 
         # Method 4: .compact mobile view (lightweight, often less blocked)
         try:
             compact_url = old_url.rstrip('/') + '/.compact'
-            async with AsyncSession(impersonate="chrome120") as s:
-                resp = await s.get(compact_url, timeout=20, allow_redirects=True, headers=headers)
-                if resp.status_code == 200:
-                    extracted = self._extract_text_from_html(resp.text)
-                    if extracted and not is_block_page(extracted):
-                        return f"[REDDIT COMPACT] {extracted}", None
+            s = self._session("chrome120")
+            resp = await s.get(compact_url, timeout=20, allow_redirects=True, headers=headers)
+            if resp.status_code == 200:
+                extracted = self._extract_text_from_html(resp.text)
+                if extracted and not is_block_page(extracted):
+                    return f"[REDDIT COMPACT] {extracted}", None
         except Exception as e:
             logging.warning(f"Reddit .compact fallback failed: {str(e)}")
 
@@ -697,13 +1136,15 @@ class DocScraper:
 
         return None, "Reddit scraping failed via old.reddit.com, JSON API, Jina, compact, Playwright, and Google Cache"
 
-    async def process_link(self, url):
-        logging.info(f"Processing: {url}")
+    async def _scrape_link(self, url):
+        """Route url to the matching scraper and return (content, error)."""
         content = None
         error = None
 
         # Route to specialized scrapers based on domain
-        if "youtube.com" in url or "youtu.be" in url:
+        if "docs.google.com/document/d/" in url:
+            content, error = await self.scrape_google_doc(url)
+        elif "youtube.com" in url or "youtu.be" in url:
             content, error = await self.scrape_youtube(url)
         elif "reddit.com" in url:
             content, error = await self.scrape_reddit(url)
@@ -711,14 +1152,14 @@ class DocScraper:
             # LinkedIn blocks all scraping. Try Jina first (best chance), then general.
             jina_url = f"https://r.jina.ai/{url}"
             try:
-                async with AsyncSession(impersonate="chrome110") as s:
-                    resp = await s.get(jina_url, timeout=25)
-                    if resp.status_code == 200 and len(resp.text) > 200:
-                        sanitized = self._sanitize_text(resp.text)
-                        if not is_block_page(sanitized):
-                            content = f"[JINA LINKEDIN] {sanitized}"
-                        else:
-                            logging.warning(f"Jina LinkedIn returned a block/error page for {url}")
+                s = self._session("chrome110")
+                resp = await s.get(jina_url, timeout=25)
+                if resp.status_code == 200 and len(resp.text) > 200:
+                    sanitized = self._sanitize_text(resp.text)
+                    if not is_block_page(sanitized):
+                        content = f"[JINA LINKEDIN] {sanitized}"
+                    else:
+                        logging.warning(f"Jina LinkedIn returned a block/error page for {url}")
             except Exception:
                 pass
             if not content:
@@ -747,6 +1188,18 @@ class DocScraper:
         else:
             content, error = await self.scrape_general(url)
 
+        return content, error
+
+    async def _scrape_bounded(self, url):
+        """Scrape url within the concurrency limits and LINK_TIMEOUT; returns (content, error)."""
+        # Take the host slot first so a busy host doesn't tie up a global slot
+        async with self._host_sem(url), self._global_sem():
+            logging.info(f"Processing: {url}")
+            try:
+                content, error = await asyncio.wait_for(self._scrape_link(url), config.LINK_TIMEOUT)
+            except asyncio.TimeoutError:
+                content, error = None, f"Timed out after {config.LINK_TIMEOUT}s"
+
         # FINAL GATE: Reject block pages, cookie consent, login walls, etc.
         # This catches garbage content regardless of which method produced it.
         if content and is_block_page(content):
@@ -754,19 +1207,54 @@ class DocScraper:
             content = None
             error = "Content was a block page, cookie consent, or login wall"
 
+        return content, error
+
+    async def process_link(self, url, context=None, output_file=None):
+        """Scrape one URL and append the result to output_file (default: self.output_file).
+
+        context is the source-doc text around the link; it is written above the content.
+        At most config.SCRAPE_CONCURRENCY links (HOST_CONCURRENCY per host) are scraped at once.
+        Results are cached per cleaned URL, and duplicate links share one in-flight scrape.
+        """
+        output_file = output_file or self.output_file
+        if url.lower().startswith(_SKIP_PREFIXES) or _SKIP_HOSTS_RE.match(url):
+            logging.info(f"Skipping unscrapable link: {url}")
+            return
+
+        try:
+            key = self._clean_url(url)
+        except ValueError as e:
+            # e.g. placeholder hosts like https://[your-domain]/api; only this link fails
+            logging.warning(f"Failed to scrape: {url} - Malformed URL: {e}")
+            self._queue_write(self.failed_log, f"{url} - Error: Malformed URL: {e}\n")
+            return
+
+        if key in self._url_cache:
+            logging.info(f"Reusing earlier result for: {url}")
+            self._url_cache.move_to_end(key)
+            content, error = self._url_cache[key], None
+        else:
+            task = self._inflight.get(key)
+            if task is None:
+                task = self._inflight[key] = asyncio.create_task(self._scrape_bounded(url))
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            # shield: one caller giving up must not cancel the scrape for the others
+            content, error = await asyncio.shield(task)
+            if content:
+                _lru_put(self._url_cache, key, content, _URL_CACHE_SIZE)
+
+        # Appends go through the writer task; call flush_writes() before reading the files
         if content:
-            with open(self.output_file, "a", encoding="utf-8") as f:
-                f.write(f"\n\n--- CONTENT FROM: {url} ---\n\n")
-                f.write(content)
+            context_line = f"**Context:** {context[:300]}\n\n" if context else ""
+            self._queue_write(output_file, f"\n\n--- CONTENT FROM: {url} ---\n\n{context_line}{content}")
             logging.info(f"Successfully scraped: {url}")
         else:
-            with open(self.failed_log, "a", encoding="utf-8") as f:
-                f.write(f"{url} - Error: {error}\n")
+            self._queue_write(self.failed_log, f"{url} - Error: {error}\n")
             logging.warning(f"Failed to scrape: {url} - {error}")
 
     async def run(self, doc_url, target_tab_id=None):
         # Extract ID from URL
-        match = re.search(r'/d/([^/]+)', doc_url)
+        match = _DOC_URL_ID_RE.search(doc_url)
         if not match:
             logging.error("Invalid Google Doc URL")
             return
@@ -775,7 +1263,7 @@ class DocScraper:
         
         # If target_tab_id不是直接传进来的，从URL里提取
         if not target_tab_id:
-            tab_match = re.search(r'[#?&]tab=([^&?#]+)', doc_url)
+            tab_match = _TAB_RE.search(doc_url)
             target_tab_id = tab_match.group(1) if tab_match else None
         
         timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
@@ -787,27 +1275,23 @@ class DocScraper:
         logging.info(f"Unique output file for this session: {self.output_file}")
 
         # Initialize files
-        with open(self.output_file, "w", encoding="utf-8") as f:
-            f.write(f"# SCRAPE SESSION FOR DOC {doc_id} (Tab: {target_tab_id or 'Auto/Interactive'})\n**START:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        with open(self.failed_log, "w", encoding="utf-8") as f:
-            f.write(f"--- FAILED LINKS SESSION FOR DOC {doc_id}: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n")
+        await asyncio.gather(
+            asyncio.to_thread(_write_file, self.output_file,
+                              f"# SCRAPE SESSION FOR DOC {doc_id} (Tab: {target_tab_id or 'Auto/Interactive'})\n**START:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"),
+            asyncio.to_thread(_write_file, self.failed_log,
+                              f"--- FAILED LINKS SESSION FOR DOC {doc_id}: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n"),
+        )
 
         logging.info(f"Fetching document: {doc_id}")
         
-        doc_data = self.get_doc_content(doc_id)
+        doc_data = await asyncio.to_thread(self.get_doc_content, doc_id)
         if not doc_data:
             return
         # Handle Tabs vs Body
         content_elements = []
         if 'tabs' in doc_data:
             # Flatten all tabs for easy selection
-            all_tabs = []
-            def collect_tabs(tabs_list):
-                for t in tabs_list:
-                    all_tabs.append(t)
-                    if 'childTabs' in t:
-                        collect_tabs(t['childTabs'])
-            collect_tabs(doc_data['tabs'])
+            all_tabs = _flatten_tabs(doc_data['tabs'])
 
             found_tab = None
 
@@ -823,7 +1307,6 @@ class DocScraper:
             
             # If no tab found yet, try interactive or default
             if not found_tab:
-                import sys
                 if sys.stdin.isatty():
                     # Interactive Mode
                     print("\n--- MULTIPLE TABS DETECTED ---", flush=True)
@@ -881,57 +1364,48 @@ class DocScraper:
         links = self.extract_links_from_content(content_elements)
         logging.info(f"Found {len(links)} links to process.")
 
-        tasks = [self.process_link(link) for link in links]
-        await asyncio.gather(*tasks)
+        tasks = [self.process_link(url, context) for url, context in links]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            await self.aclose()
         logging.info("Scraping task completed.")
 
     def extract_links_from_content(self, content):
-        links = []
+        """Return unique (url, context) pairs, keeping the first context seen for each URL."""
+        links = {}
         logging.info(f"Processing {len(content)} top-level elements.")
         
+        # Key on the cleaned URL so tracking-parameter and #fragment variants collapse into one fetch
         for element in content:
-            links.extend(self._find_links_in_element(element))
+            for url, context in self._find_links_in_element(element):
+                url = _strip_fragment(url)
+                try:
+                    key = self._clean_url(url)
+                except ValueError:
+                    # Unparseable URL: dedupe on the raw text, process_link reports it
+                    key = url
+                links.setdefault(key, (url, context))
             
-        return list(set(links)) # Unique links
+        return list(links.values()) # Unique links
 
     def get_all_links_from_doc(self, doc_id):
         """
         Scans the entire Google Doc and extracts all links found in the content.
-        """
-        doc = self.get_doc_content(doc_id)
-        if not doc:
-            return []
 
-        content = []
-        
-        # 1. Add Main Body
-        if 'body' in doc and 'content' in doc['body']:
-            content.extend(doc['body']['content'])
-            
-        # 2. Add All Tabs (recursively)
-        if 'tabs' in doc:
-            def collect_tabs(tabs_list):
-                for t in tabs_list:
-                    if 'documentTab' in t:
-                        content.extend(t['documentTab'].get('body', {}).get('content', []))
-                    if 'childTabs' in t:
-                        collect_tabs(t['childTabs'])
-            collect_tabs(doc['tabs'])
-
-        logging.info(f"Scanning {len(content)} elements for ALL links...")
-
-        links = []
-        for element in content:
-            links.extend(self._find_links_in_element(element))
-
-        return list(set(links))
+        Returns unique (url, context) pairs; context is the paragraph text around the link.
+        Raises HttpError if the doc can't be read, so callers can tell a failed fetch
+        (and whether it is worth retrying) from a doc without links.
+        """
+        doc = self._fetch_doc(doc_id)
+        return self.extract_links_from_content(self._collect_doc_content(doc))
 
 if __name__ == "__main__":
-    import sys
     if len(sys.argv) < 2:
         print("Usage: python scraper.py <google_doc_url> [tab_id]")
     else:
         url = sys.argv[1]
         tab = sys.argv[2] if len(sys.argv) > 2 else None
+        install_uvloop()
         scraper = DocScraper()
         asyncio.run(scraper.run(url, tab))